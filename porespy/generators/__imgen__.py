@@ -1,18 +1,24 @@
 import sys
+import math
 import numpy as np
+from itertools import chain
+from functools import lru_cache
 from edt import edt
 import porespy as ps
-from numba import njit
+from numba import njit, prange, vectorize
 from skimage.morphology import disk, ball
 import scipy.spatial as sptl
 import scipy.ndimage as spim
+from scipy.special import erfc, erfcinv
 from porespy.tools import norm_to_uniform, ps_ball, ps_disk, get_border
+from porespy.tools import _edt
 from typing import List
 from numpy import array
 from tqdm import tqdm
 
 
-def insert_shape(im, element, center=None, corner=None, value=1, mode="overwrite"):
+def insert_shape(im, element, center=None, corner=None, value=1,
+                 mode="overwrite", copy=True):
     r"""
     Inserts sub-image into a larger image at the specified location.
 
@@ -42,14 +48,20 @@ def insert_shape(im, element, center=None, corner=None, value=1, mode="overwrite
         main image.  If 'overlay' the inserted image is added to the main
         image.  In both cases the inserted image is multiplied by ``value``
         first.
+    copy : boolean
+        If ``True`` (default) the element is inserted into a copy of ``im``.
+        If ``False`` then ``im`` is modified in place, which avoids a full
+        copy of the image when inserting many shapes into the same array.
 
     Returns
     -------
     im : ND-array
-        A copy of ``im`` with the supplied element inserted.
+        A copy of ``im`` with the supplied element inserted, or ``im``
+        itself if ``copy`` is ``False``.
 
     """
-    im = im.copy()
+    if copy:
+        im = im.copy()
     if im.ndim != element.ndim:
         raise Exception(
             f"Image shape {im.shape} and element shape {element.shape} do not match"
@@ -58,26 +70,26 @@ def insert_shape(im, element, center=None, corner=None, value=1, mode="overwrite
     s_el = []
     if (center is not None) and (corner is None):
         for dim in range(im.ndim):
-            r, d = np.divmod(element.shape[dim], 2)
+            r, d = divmod(element.shape[dim], 2)
             if d == 0:
                 raise Exception(
                     "Cannot specify center point when element "
                     + "has one or more even dimension"
                 )
-            lower_im = np.amax((center[dim] - r, 0))
-            upper_im = np.amin((center[dim] + r + 1, im.shape[dim]))
+            lower_im = max(center[dim] - r, 0)
+            upper_im = min(center[dim] + r + 1, im.shape[dim])
             s_im.append(slice(lower_im, upper_im))
-            lower_el = np.amax((lower_im - center[dim] + r, 0))
-            upper_el = np.amin((upper_im - center[dim] + r, element.shape[dim]))
+            lower_el = max(lower_im - center[dim] + r, 0)
+            upper_el = min(upper_im - center[dim] + r, element.shape[dim])
             s_el.append(slice(lower_el, upper_el))
     elif (corner is not None) and (center is None):
         for dim in range(im.ndim):
             L = int(element.shape[dim])
-            lower_im = np.amax((corner[dim], 0))
-            upper_im = np.amin((corner[dim] + L, im.shape[dim]))
+            lower_im = max(corner[dim], 0)
+            upper_im = min(corner[dim] + L, im.shape[dim])
             s_im.append(slice(lower_im, upper_im))
-            lower_el = np.amax((lower_im - corner[dim], 0))
-            upper_el = np.amin((upper_im - corner[dim], element.shape[dim]))
+            lower_el = max(lower_im - corner[dim], 0)
+            upper_el = min(upper_im - corner[dim], element.shape[dim])
             s_el.append(slice(min(lower_el, upper_el), upper_el))
     else:
         raise Exception("Cannot specify both corner and center")
@@ -91,6 +103,21 @@ def insert_shape(im, element, center=None, corner=None, value=1, mode="overwrite
     return im
 
 
+@lru_cache(maxsize=64)
+def _ps_round(r, ndim, smooth=True):
+    r"""
+    Returns ``ps_disk`` or ``ps_ball`` of radius ``r``, caching the result
+    since the generators often request the same sizes repeatedly.  The
+    returned array is shared between callers so it is made read-only.
+    """
+    if ndim == 2:
+        strel = ps_disk(r, smooth=smooth)
+    else:
+        strel = ps_ball(r, smooth=smooth)
+    strel.setflags(write=False)
+    return strel
+
+
 def RSA(im: array,
         radius: int,
         volume_fraction: int = 1,
@@ -144,12 +171,9 @@ def RSA(im: array,
 
     Notes
     -----
-    This function uses Numba to speed up the search for valid sphere insertion
-    points.  It seems that Numba does not look at the state of the scipy
-    random number generator, so setting the seed to a known value has no
-    effect on the output of this function. Each call to this function will
-    produce a unique image.  If you wish to use the same realization multiple
-    times you must save the array (e.g. ``numpy.save``).
+    The insertion points are drawn from NumPy's global random state, so
+    calling ``np.random.seed`` beforehand makes the result reproducible.
+    Otherwise each call to this function will produce a unique image.
 
     References
     ----------
@@ -164,49 +188,53 @@ def RSA(im: array,
     vf_final = volume_fraction
     vf_start = im.sum() / im.size
     print("Initial volume fraction:", vf_start)
-    if im.ndim == 2:
-        template_lg = ps_disk(radius * 2)
-        template_sm = ps_disk(radius)
-    else:
-        template_lg = ps_ball(radius * 2)
-        template_sm = ps_ball(radius)
+    template_lg = _ps_round(radius * 2, im.ndim)
+    template_sm = _ps_round(radius, im.ndim)
     vf_template = template_sm.sum() / im.size
     # Pad image by the radius of large template to enable insertion near edges
     im = np.pad(im, pad_width=2 * radius, mode="edge")
     # Depending on mode, adjust mask to remove options around edge
     if mode == "contained":
-        border = get_border(im.shape, thickness=2 * radius, mode="faces")
+        thickness = 2 * radius
     elif mode == "extended":
-        border = get_border(im.shape, thickness=radius + 1, mode="faces")
+        thickness = radius + 1
     else:
         raise Exception("Unrecognized mode: ", mode)
+    border = get_border(im.shape, thickness=thickness, mode="faces")
     # Remove border pixels
     im[border] = True
     # Dilate existing objects by strel to remove pixels near them
-    # from consideration for sphere placement
+    # from consideration for sphere placement.  Only voxels inside the border
+    # can be valid, so the distance transform is only needed there plus a
+    # margin of one radius, which holds all features that are close enough
+    # to matter.
     print("Dilating foreground features by sphere radius")
-    dt = edt(im == 0)
-    options_im = dt >= radius
+    s = tuple([slice(thickness - radius, d - thickness + radius) for d in im.shape])
+    dt = _edt(im[s] == 0)
+    options_im = np.zeros_like(im)
+    options_im[s] = dt >= radius
     # ------------------------------------------------------------------------
     # Begin inserting the spheres
     vf = vf_start
-    free_sites = np.flatnonzero(options_im)
-    i = 0
-    while (vf <= vf_final) and (i < n_max) and (len(free_sites) > 0):
-        c, count = _make_choice(options_im, free_sites=free_sites)
-        # The 100 below is arbitrary and may change performance
-        if count > 100:
-            # Regenerate list of free_sites
-            print("Regenerating free_sites after", i, "iterations")
-            free_sites = np.flatnonzero(options_im)
-        if all(np.array(c) == -1):
-            break
-        s_sm = tuple([slice(x - radius, x + radius + 1, None) for x in c])
-        s_lg = tuple([slice(x - 2 * radius, x + 2 * radius + 1, None) for x in c])
-        im[s_sm] += template_sm  # Add ball to image
-        options_im[s_lg][template_lg] = False  # Update extended region
-        vf += vf_template
-        i += 1
+    # Store the free sites using the smallest int type that can index im
+    # since this list is indexed on every draw and pruned as the image fills
+    dtype = np.int32 if im.size < np.iinfo(np.int32).max else np.int64
+    free_sites = np.flatnonzero(options_im).astype(dtype)
+    # Every insertion clears the large template in options_im, so it is
+    # packed into one bit per voxel to cut the bytes that are written
+    options_im = np.packbits(options_im)
+    del dt
+    # The whole insertion loop runs in numba.  Its random generator is
+    # separate from NumPy's, so it is seeded from the global state to keep
+    # np.random.seed effective.  The templates are passed as the flat offsets
+    # of their voxels from the center, which works since im is C-contiguous.
+    offsets_sm, offsets_lg = [
+        ((np.argwhere(t) - (np.array(t.shape) - 1) // 2)
+         @ (np.array(im.strides) // im.itemsize)).astype(dtype)
+        for t in (template_sm, template_lg)]
+    i = _insert_spheres(im.reshape(-1), options_im, free_sites, offsets_sm,
+                        offsets_lg, vf, vf_final, vf_template, n_max,
+                        np.random.randint(0, 2**31 - 1))
     print("Number of spheres inserted:", i)
     # ------------------------------------------------------------------------
     # Get slice into returned image to retain original size
@@ -217,69 +245,93 @@ def RSA(im: array,
     return im
 
 
-@njit
-def _make_choice(options_im, free_sites):
+@njit(cache=True)
+def _insert_spheres(im, options, free_sites, offsets_sm, offsets_lg,
+                    vf, vf_final, vf_template, n_max, seed):
     r"""
-    This function is called by _begin_inserting to find valid insertion points
+    Inserts spheres at random valid locations until ``vf_final`` or
+    ``n_max`` is reached, or no valid locations remain.  Each sphere sets
+    the voxels at ``offsets_sm`` from its center in the flattened ``im``,
+    and clears the bits at ``offsets_lg`` in ``options``, which is
+    ``options_im`` flattened and packed with ``np.packbits``.  Both arrays
+    are updated in place, and the number of spheres inserted is returned.
+    """
+    np.random.seed(seed)
+    n = len(free_sites)
+    i = 0
+    while (vf <= vf_final) and (i < n_max) and (n > 0):
+        ind = _make_choice(options, free_sites, n)
+        # The limit of 100 attempts in _make_choice is arbitrary and may
+        # change performance
+        if ind < 0:
+            # Regenerate list of free_sites by dropping the ones that have
+            # since been excluded, which only reads the remaining sites
+            # rather than searching all of options_im again
+            print("Regenerating free_sites after", i, "iterations")
+            n = _prune_sites(options, free_sites, n)
+            continue
+        # Add ball to image
+        for k in range(len(offsets_sm)):
+            im[ind + offsets_sm[k]] = True
+        # Update extended region
+        for k in range(len(offsets_lg)):
+            j = ind + offsets_lg[k]
+            options[j >> 3] &= ~np.uint8(128 >> (j & 7))
+        vf += vf_template
+        i += 1
+    return i
+
+
+@njit(cache=True)
+def _make_choice(options, free_sites, n, max_iters=100):
+    r"""
+    This function is called by ``_insert_spheres`` to find valid insertion
+    points
 
     Parameters
     ----------
-    options_im : ND-array
-        An array with ``True`` at all valid locations and ``False`` at all
-        locations where a sphere already exists PLUS a region of radius R
-        around each sphere since these points are also invalid insertion
-        points.
+    options : ND-array
+        A flattened array, packed with ``np.packbits``, with bits set at all
+        valid locations and cleared at all locations where a sphere already
+        exists PLUS a region of radius R around each sphere since these
+        points are also invalid insertion points.
     free_sites : array_like
-        A 1D array containing valid insertion indices.  This list is used to
-        select insertion points from a limited which occasionally gets
-        smaller.
+        A 1D array whose first ``n`` entries are the flat indices of the
+        candidate insertion points.  This list occasionally gets smaller.
+    n : int
+        The number of candidates in ``free_sites``.
+    max_iters : int
+        The number of random draws to try before giving up.
 
     Returns
     -------
-    coords : list
-        The XY or XYZ coordinates of the next insertion point
-    count : int
-        The number of attempts that were needed to find valid point.  If
-        this value gets too high, a short list of ``free_sites`` should be
-        generated in the calling function.
+    ind : int
+        The flat index of the next insertion point.  If no valid point was
+        found after ``max_iters`` draws then -1 is returned and a shorter
+        list of ``free_sites`` should be generated.
 
     """
-    choice = False
-    count = 0
-    upper_limit = len(free_sites)
-    max_iters = upper_limit * 20
-    if options_im.ndim == 2:
-        coords = [-1, -1]
-        Nx, Ny = options_im.shape
-        while not choice:
-            if count >= max_iters:
-                coords = [-1, -1]
-                break
-            ind = np.random.randint(0, upper_limit)
-            # This numpy function is not supported by numba yet
-            # c1, c2 = np.unravel_index(free_sites[ind], options_im.shape)
-            # So using manual unraveling
-            coords[1] = free_sites[ind] % Ny
-            coords[0] = (free_sites[ind] // Ny) % Nx
-            choice = options_im[coords[0], coords[1]]
-            count += 1
-    if options_im.ndim == 3:
-        coords = [-1, -1, -1]
-        Nx, Ny, Nz = options_im.shape
-        while not choice:
-            if count >= max_iters:
-                coords = [-1, -1, -1]
-                break
-            ind = np.random.randint(0, upper_limit)
-            # This numpy function is not supported by numba yet
-            # c1, c2, c3 = np.unravel_index(free_sites[ind], options_im.shape)
-            # So using manual unraveling
-            coords[2] = free_sites[ind] % Nz
-            coords[1] = (free_sites[ind] // Nz) % Ny
-            coords[0] = (free_sites[ind] // (Nz * Ny)) % Nx
-            choice = options_im[coords[0], coords[1], coords[2]]
-            count += 1
-    return coords, count
+    for _ in range(max_iters):
+        ind = free_sites[np.random.randint(0, n)]
+        if (options[ind >> 3] >> (7 - (ind & 7))) & 1:
+            return ind
+    return -1
+
+
+@njit(cache=True)
+def _prune_sites(options, free_sites, n):
+    r"""
+    Moves the entries of ``free_sites[:n]`` whose bits are still set in the
+    packed ``options`` to the front of the array and returns how many there
+    are.
+    """
+    m = 0
+    for k in range(n):
+        ind = free_sites[k]
+        if (options[ind >> 3] >> (7 - (ind & 7))) & 1:
+            free_sites[m] = ind
+            m += 1
+    return m
 
 
 def bundle_of_tubes(shape: List[int], spacing: int):
@@ -319,19 +371,36 @@ def bundle_of_tubes(shape: List[int], spacing: int):
     Yi = np.array(Yi, dtype=int)
     temp[tuple(np.meshgrid(Xi, Yi))] = 1
     inds = np.where(temp)
-    for i in range(len(inds[0])):
-        r = np.random.randint(1, (spacing / 2))
-        try:
-            s1 = slice(inds[0][i] - r, inds[0][i] + r + 1)
-            s2 = slice(inds[1][i] - r, inds[1][i] + r + 1)
-            temp[s1, s2] = ps_disk(r)
-        except ValueError:
-            odd_shape = np.shape(temp[s1, s2])
-            temp[s1, s2] = ps_disk(r)[: odd_shape[0], : odd_shape[1]]
+    rs = np.random.randint(1, (spacing / 2), size=len(inds[0]))
+    if len(rs) > 0:
+        # Store each required disk centered in a common sized template
+        r_max = rs.max()
+        disks = np.zeros([r_max + 1] + [2 * r_max + 1] * 2, dtype=bool)
+        for r in np.unique(rs):
+            s = slice(r_max - r, r_max + r + 1)
+            disks[r, s, s] = _ps_round(r, 2)
+        _stamp_disks(temp, inds[0], inds[1], rs, disks)
     im = np.broadcast_to(array=np.atleast_3d(temp), shape=shape)
     return im
 
 
+@njit(cache=True)
+def _stamp_disks(im, xs, ys, rs, disks):
+    r"""
+    Writes the disk of radius ``rs[i]`` into ``im`` centered on
+    ``[xs[i], ys[i]]``, cropping any part that lies outside the image.
+    ``disks[r]`` must contain the disk of radius ``r`` centered in the
+    template.
+    """
+    r_max = (disks.shape[1] - 1) // 2
+    Nx, Ny = im.shape
+    for n in range(len(xs)):
+        r = rs[n]
+        for i in range(max(xs[n] - r, 0), min(xs[n] + r + 1, Nx)):
+            for j in range(max(ys[n] - r, 0), min(ys[n] + r + 1, Ny)):
+                im[i, j] = disks[r, i - xs[n] + r_max, j - ys[n] + r_max]
+
+
 def polydisperse_spheres(
     shape: List[int], porosity: float, dist, nbins: int = 5, r_min: int = 5
 ):
@@ -382,7 +451,7 @@ def polydisperse_spheres(
         phi_im = im.sum() / np.prod(shape)
         phi_corrected = 1 - (1 - phi_desired) / phi_im
         temp = overlapping_spheres(shape=shape, radius=r, porosity=phi_corrected)
-        im = im * temp
+        np.logical_and(im, temp, out=im)
     return im
 
 
@@ -420,25 +489,27 @@ def voronoi_edges(shape: List[int], radius: int, ncells: int, flat_faces: bool =
     im = np.zeros(shape, dtype=bool)
     base_pts = np.random.rand(ncells, 3) * shape
     if flat_faces:
-        # Reflect base points
-        Nx, Ny, Nz = shape
-        orig_pts = base_pts
-        base_pts = np.vstack((base_pts, [-1, 1, 1] * orig_pts + [2.0 * Nx, 0, 0]))
-        base_pts = np.vstack((base_pts, [1, -1, 1] * orig_pts + [0, 2.0 * Ny, 0]))
-        base_pts = np.vstack((base_pts, [1, 1, -1] * orig_pts + [0, 0, 2.0 * Nz]))
-        base_pts = np.vstack((base_pts, [-1, 1, 1] * orig_pts))
-        base_pts = np.vstack((base_pts, [1, -1, 1] * orig_pts))
-        base_pts = np.vstack((base_pts, [1, 1, -1] * orig_pts))
+        # Reflect base points across each face, filling one preallocated array
+        all_pts = np.empty((7 * ncells, 3))
+        all_pts[:ncells] = base_pts
+        for ax in range(3):
+            far = all_pts[(ax + 1) * ncells:(ax + 2) * ncells]
+            far[:] = base_pts
+            far[:, ax] = 2.0 * shape[ax] - base_pts[:, ax]
+            near = all_pts[(ax + 4) * ncells:(ax + 5) * ncells]
+            near[:] = base_pts
+            near[:, ax] *= -1
+        base_pts = all_pts
     vor = sptl.Voronoi(points=base_pts)
     vor.vertices = np.around(vor.vertices)
     vor.vertices *= (np.array(im.shape) - 1) / np.array(im.shape)
     vor.edges = _get_Voronoi_edges(vor)
-    for row in vor.edges:
-        pts = vor.vertices[row].astype(int)
-        if np.all(pts >= 0) and np.all(pts < im.shape):
-            line_pts = line_segment(pts[0], pts[1])
-            im[tuple(line_pts)] = True
-    im = edt(~im) > radius
+    pts = vor.vertices[vor.edges].astype(int)
+    # Draw all edges which lie fully inside the image at once
+    valid = np.all((pts >= 0) * (pts < im.shape), axis=(1, 2))
+    line_pts = _line_segments(pts[valid, 0], pts[valid, 1])
+    im[tuple(line_pts)] = True
+    im = _edt(~im) > radius
     return im
 
 
@@ -459,20 +530,20 @@ def _get_Voronoi_edges(vor):
     each vertex in the Voronoi diagram.  These vertex indices can be used to
     index straight into the ``vor.vertices`` array to get spatial positions.
     """
-    edges = [[], []]
-    for facet in vor.ridge_vertices:
-        # Create a closed cycle of vertices that define the facet
-        edges[0].extend(facet[:-1] + [facet[-1]])
-        edges[1].extend(facet[1:] + [facet[0]])
-    edges = np.vstack(edges).T  # Convert to scipy-friendly format
-    mask = np.any(edges == -1, axis=1)  # Identify edges at infinity
-    edges = edges[~mask]  # Remove edges at infinity
-    edges = np.sort(edges, axis=1)  # Move all points to upper triangle
-    # Remove duplicate pairs
-    edges = edges[:, 0] + 1j * edges[:, 1]  # Convert to imaginary
-    edges = np.unique(edges)  # Remove duplicates
-    edges = np.vstack((np.real(edges), np.imag(edges))).T  # Back to real
-    edges = np.array(edges, dtype=int)
+    lengths = np.array([len(facet) for facet in vor.ridge_vertices])
+    starts = np.fromiter(chain.from_iterable(vor.ridge_vertices),
+                         dtype=int, count=lengths.sum())
+    # Create a closed cycle of vertices that define each facet by pairing
+    # each vertex with the next, and the last vertex with the first
+    ends = np.roll(starts, -1)
+    first = np.cumsum(lengths) - lengths
+    ends[first + lengths - 1] = starts[first]
+    # Write the pairs with the lower index first (i.e. the upper triangle)
+    edges = np.empty((len(starts), 2), dtype=int)
+    np.minimum(starts, ends, out=edges[:, 0])
+    np.maximum(starts, ends, out=edges[:, 1])
+    edges = edges[edges[:, 0] != -1]  # Remove edges at infinity
+    edges = np.unique(edges, axis=0)  # Remove duplicate pairs
     return edges
 
 
@@ -591,16 +662,38 @@ def lattice_spheres(shape: List[int],
         im[offset[0]::spacing[0],
            offset[1]+int(spacing[1]/2)::spacing[1],
            offset[2]+int(spacing[2]/2)::spacing[2]] = True
-    # TODO: The following might be faster to use np.where to find points
-    # the directly insert spheres at each location using the numba jit
-    # versions of insert_spheres
-    if smooth:
-        im = ~(edt(~im) < r)
+    # Insert a sphere directly at each lattice point, which is much cheaper
+    # than a distance transform of the full image since the points are sparse
+    crds = np.argwhere(im)
+    if im.ndim == 2:
+        crds = np.hstack((crds, np.zeros((len(crds), 1), dtype=int)))
+        template = _ps_round(r, 2, smooth)[..., None]
     else:
-        im = ~(edt(~im) <= r)
+        template = _ps_round(r, 3, smooth)
+    spheres = np.zeros(im.shape + (1, ) * (3 - im.ndim), dtype=bool)
+    _stamp_template(spheres, crds, template)
+    im = ~spheres.reshape(im.shape)
     return im
 
 
+@njit(parallel=True, cache=True)
+def _stamp_template(im, crds, template):
+    r"""
+    Sets ``im`` to ``True`` wherever ``template`` is ``True`` when centered
+    on each of the points in ``crds``, cropping any part that lies outside
+    the image.  ``template`` must have odd dimensions.
+    """
+    rx, ry, rz = [(n - 1) // 2 for n in template.shape]
+    Nx, Ny, Nz = im.shape
+    for n in prange(len(crds)):
+        x, y, z = crds[n]
+        for i in range(max(x - rx, 0), min(x + rx + 1, Nx)):
+            for j in range(max(y - ry, 0), min(y + ry + 1, Ny)):
+                for k in range(max(z - rz, 0), min(z + rz + 1, Nz)):
+                    if template[i - x + rx, j - y + ry, k - z + rz]:
+                        im[i, j, k] = True
+
+
 def overlapping_spheres(shape: List[int],
                         radius: int,
                         porosity: float,
@@ -644,46 +737,50 @@ def overlapping_spheres(shape: List[int],
     if np.size(shape) == 1:
         shape = np.full((3, ), int(shape))
     ndim = (shape != 1).sum()
-    s_vol = ps_disk(radius).sum() if ndim == 2 else ps_ball(radius).sum()
+    s_vol = _ps_round(radius, ndim).sum()
 
     bulk_vol = np.prod(shape)
-    N = int(np.ceil((1 - porosity) * bulk_vol / s_vol))
     im = np.random.random(size=shape)
 
     # Helper functions for calculating porosity: phi = g(f(N))
     def f(N):
-        return edt(im > N / bulk_vol) < radius
+        return _edt(im > N / bulk_vol) < radius
 
     def g(im):
         r"""Returns fraction of 0s, given a binary image"""
         return 1 - im.sum() / np.prod(shape)
 
-    # # Newton's method for getting image porosity match the given
-    # w = 1.0                         # Damping factor
-    # dN = 5 if ndim == 2 else 25     # Perturbation
-    # for i in range(iter_max):
-    #     err = g(f(N)) - porosity
-    #     d_err = (g(f(N+dN)) - g(f(N))) / dN
-    #     if d_err == 0:
-    #         break
-    #     if abs(err) <= tol:
-    #         break
-    #     N2 = N - int(err/d_err)   # xnew = xold - f/df
-    #     N = w * N2 + (1-w) * N
-
-    # Bisection search: N is always undershoot (bc. of overlaps)
-    N_low, N_high = N, 4 * N
+    # Each voxel is a sphere center with probability N/bulk_vol, so a voxel
+    # is void with probability (1 - N/bulk_vol)**s_vol.  Solving this for N
+    # gives the number of spheres directly (i.e. the Matheron estimate).
+    N = bulk_vol * (1 - porosity**(1 / s_vol))
+    # Spheres near the faces are truncated by the border so the estimate
+    # slightly undershoots, so rescale N using the measured porosity.  The
+    # porosity is a step function of N on a fixed random field, so this can
+    # oscillate; once N has landed on both sides of the target the bracket
+    # is bisected instead.
+    N_low, N_high = 0, np.inf
+    best = None
     for i in range(iter_max):
-        N = np.mean([N_high, N_low], dtype=int)
-        err = g(f(N)) - porosity
+        spheres = f(N)
+        phi = g(spheres)
+        err = phi - porosity
+        if (best is None) or (abs(err) < abs(best[0])):
+            best = (err, spheres)
+        if abs(err) <= tol:
+            break
         if err > 0:
             N_low = N
         else:
             N_high = N
-        if abs(err) <= tol:
-            break
+        if N_high < np.inf and N_low > 0:
+            N = (N_low + N_high) / 2
+        elif 0 < phi < 1:
+            N = N * np.log(porosity) / np.log(phi)
+        else:
+            N = 2 * N if phi == 1 else N / 2
 
-    return ~f(N)
+    return ~best[1]
 
 
 def perlin_noise(shape: List[int], porosity=None, octaves: int = 3,
@@ -741,23 +838,25 @@ def perlin_noise(shape: List[int], porosity=None, octaves: int = 3,
     # Check inputs for various sins
     if res.size != shape.size:
         raise Exception('shape and res must have same dimensions')
-    if np.any(np.mod(shape, res) > 0):
+    pow_res = res**octaves
+    if np.any(shape % res):
         raise Exception('res must be a multiple of shape along each axis')
-    if np.any(shape / res**octaves < 1):
+    if np.any(shape < pow_res):
         raise Exception('(res[i])**octaves must be <= shape[i]')
-    check = shape / (res**octaves)
-    if np.any(check % 1):
+    if np.any(shape % pow_res):
         raise Exception("Image size must be factor of res**octaves")
 
-    # Generate noise
-    noise = np.zeros(shape)
+    # Generate noise.  If the noise is only going to be thresholded then
+    # single precision is plenty and halves the memory traffic.
+    dtype = np.float64 if porosity is None else np.float32
+    noise = np.zeros(shape, dtype=dtype)
     frequency = 1
     amplitude = 1
     for _ in tqdm(range(octaves), file=sys.stdout):
         if noise.ndim == 2:
-            noise += amplitude * _perlin_noise_2D(shape, frequency * res)
+            noise += amplitude * _perlin_noise_2D(shape, frequency * res, dtype)
         elif noise.ndim == 3:
-            noise += amplitude * _perlin_noise_3D(shape, frequency * res)
+            noise += amplitude * _perlin_noise_3D(shape, frequency * res, dtype)
         frequency *= 2
         amplitude *= persistence
 
@@ -768,105 +867,132 @@ def perlin_noise(shape: List[int], porosity=None, octaves: int = 3,
     return noise
 
 
-def _perlin_noise_3D(shape, res):
-    def f(t):
-        return 6 * t**5 - 15 * t**4 + 10 * t**3
-
-    delta = res / shape
+def _perlin_noise_3D(shape, res, dtype=float):
     d = shape // res
-    grid = np.mgrid[0:res[0]:delta[0], 0:res[1]:delta[1], 0:res[2]:delta[2]]
-    grid = grid.transpose(1, 2, 3, 0) % 1
     # Gradients
     theta = 2 * np.pi * np.random.rand(*(res + 1))
     phi = 2 * np.pi * np.random.rand(*(res + 1))
     gradients = np.stack((np.sin(phi) * np.cos(theta),
                           np.sin(phi) * np.sin(theta),
-                          np.cos(phi)), axis=3)
-    g000 = gradients[0:-1, 0:-1, 0:-1]
-    g000 = g000.repeat(d[0], 0).repeat(d[1], 1).repeat(d[2], 2)
-    g100 = gradients[1:, 0:-1, 0:-1]
-    g100 = g100.repeat(d[0], 0).repeat(d[1], 1).repeat(d[2], 2)
-    g010 = gradients[0:-1, 1:, 0:-1]
-    g010 = g010.repeat(d[0], 0).repeat(d[1], 1).repeat(d[2], 2)
-    g110 = gradients[1:, 1:, 0:-1]
-    g110 = g110.repeat(d[0], 0).repeat(d[1], 1).repeat(d[2], 2)
-    g001 = gradients[0:-1, 0:-1, 1:]
-    g001 = g001.repeat(d[0], 0).repeat(d[1], 1).repeat(d[2], 2)
-    g101 = gradients[1:, 0:-1, 1:]
-    g101 = g101.repeat(d[0], 0).repeat(d[1], 1).repeat(d[2], 2)
-    g011 = gradients[0:-1, 1:, 1:]
-    g011 = g011.repeat(d[0], 0).repeat(d[1], 1).repeat(d[2], 2)
-    g111 = gradients[1:, 1:, 1:]
-    g111 = g111.repeat(d[0], 0).repeat(d[1], 1).repeat(d[2], 2)
-    # Ramps
-    n000 = np.sum(np.stack((grid[..., 0],
-                            grid[..., 1],
-                            grid[..., 2]), axis=3) * g000, 3)
-    n100 = np.sum(np.stack((grid[..., 0] - 1,
-                            grid[..., 1],
-                            grid[..., 2]), axis=3) * g100, 3)
-    n010 = np.sum(np.stack((grid[..., 0],
-                            grid[..., 1] - 1,
-                            grid[..., 2]), axis=3) * g010, 3)
-    n110 = np.sum(np.stack((grid[..., 0] - 1,
-                            grid[..., 1] - 1,
-                            grid[..., 2]), axis=3) * g110, 3)
-    n001 = np.sum(np.stack((grid[..., 0],
-                            grid[..., 1],
-                            grid[..., 2] - 1), axis=3) * g001, 3)
-    n101 = np.sum(np.stack((grid[..., 0] - 1,
-                            grid[..., 1],
-                            grid[..., 2] - 1), axis=3) * g101, 3)
-    n011 = np.sum(np.stack((grid[..., 0],
-                            grid[..., 1] - 1,
-                            grid[..., 2] - 1), axis=3) * g011, 3)
-    n111 = np.sum(np.stack((grid[..., 0] - 1,
-                            grid[..., 1] - 1,
-                            grid[..., 2] - 1), axis=3) * g111, 3)
-    # Interpolation
-    t = f(grid)
-    n00 = n000 * (1 - t[..., 0]) + t[..., 0] * n100
-    n10 = n010 * (1 - t[..., 0]) + t[..., 0] * n110
-    n01 = n001 * (1 - t[..., 0]) + t[..., 0] * n101
-    n11 = n011 * (1 - t[..., 0]) + t[..., 0] * n111
-    n0 = (1 - t[..., 1]) * n00 + t[..., 1] * n10
-    n1 = (1 - t[..., 1]) * n01 + t[..., 1] * n11
-    return ((1 - t[..., 2]) * n0 + t[..., 2] * n1)
-
-
-def _perlin_noise_2D(shape, res):
-    def f(t):
-        return 6 * t**5 - 15 * t**4 + 10 * t**3
-
-    delta = res / shape
-    d = shape // res
-    grid = np.mgrid[0:res[0]:delta[0],
-                    0:res[1]:delta[1]].transpose(1, 2, 0) % 1
+                          np.cos(phi))).astype(dtype)
+    noise = np.empty(shape, dtype=dtype)
+    ax, ay, az = [_perlin_axis(n, di, dtype) for n, di in zip(shape, d)]
+    _perlin3d_kernel(noise, gradients, d, ax, ay, az)
+    return noise
+
 
+def _perlin_axis(n, d, dtype):
+    r"""
+    Tabulates, as rows of a ``dtype`` array, the fractional position of each
+    of the ``n`` points along an axis within its cell of size ``d``, that
+    position less one, and the fade of the position.  Passing these to the
+    kernels keeps all of their arithmetic in ``dtype``.
+    """
+    f = (np.arange(n) % d) / d
+    return np.stack((f, f - 1, _fade(f))).astype(dtype)
+
+
+@vectorize(['float32(float32)', 'float64(float64)'], fastmath=True, cache=True)
+def _fade(t):
+    return t * t * t * (t * (6 * t - 15) + 10)
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _perlin3d_kernel(noise, gradients, d, ax, ay, az):
+    r"""
+    Computes the ramps and the interpolation between them for each voxel of
+    ``noise`` in a single pass, given the ``gradients`` at the corners of
+    each cell of size ``d`` and the per-axis tables from ``_perlin_axis``.
+    The components of the gradients are stored along the first axis so that
+    each one is contiguous.
+    """
+    Nx, Ny, Nz = noise.shape
+    g = gradients
+    for x in prange(Nx):
+        i = x // d[0]
+        u, um, tu = ax[0, x], ax[1, x], ax[2, x]
+        for y in range(Ny):
+            j = y // d[1]
+            v, vm, tv = ay[0, y], ay[1, y], ay[2, y]
+            for z in range(Nz):
+                k = z // d[2]
+                w, wm, tw = az[0, z], az[1, z], az[2, z]
+                # Ramps
+                n000 = g[0, i, j, k]*u + g[1, i, j, k]*v + g[2, i, j, k]*w
+                n100 = (g[0, i+1, j, k]*um + g[1, i+1, j, k]*v
+                        + g[2, i+1, j, k]*w)
+                n010 = (g[0, i, j+1, k]*u + g[1, i, j+1, k]*vm
+                        + g[2, i, j+1, k]*w)
+                n110 = (g[0, i+1, j+1, k]*um + g[1, i+1, j+1, k]*vm
+                        + g[2, i+1, j+1, k]*w)
+                n001 = (g[0, i, j, k+1]*u + g[1, i, j, k+1]*v
+                        + g[2, i, j, k+1]*wm)
+                n101 = (g[0, i+1, j, k+1]*um + g[1, i+1, j, k+1]*v
+                        + g[2, i+1, j, k+1]*wm)
+                n011 = (g[0, i, j+1, k+1]*u + g[1, i, j+1, k+1]*vm
+                        + g[2, i, j+1, k+1]*wm)
+                n111 = (g[0, i+1, j+1, k+1]*um + g[1, i+1, j+1, k+1]*vm
+                        + g[2, i+1, j+1, k+1]*wm)
+                # Interpolation
+                n00 = n000 + tu * (n100 - n000)
+                n10 = n010 + tu * (n110 - n010)
+                n01 = n001 + tu * (n101 - n001)
+                n11 = n011 + tu * (n111 - n011)
+                n0 = n00 + tv * (n10 - n00)
+                n1 = n01 + tv * (n11 - n01)
+                noise[x, y, z] = n0 + tw * (n1 - n0)
+
+
+def _perlin_noise_2D(shape, res, dtype=float):
+    d = shape // res
     # Gradients
     angles = 2 * np.pi * np.random.rand(res[0] + 1, res[1] + 1)
-    gradients = np.dstack((np.cos(angles), np.sin(angles)))
-    g00 = gradients[0:-1, 0:-1].repeat(d[0], 0).repeat(d[1], 1)
-    g10 = gradients[1:, 0:-1].repeat(d[0], 0).repeat(d[1], 1)
-    g01 = gradients[0:-1, 1:].repeat(d[0], 0).repeat(d[1], 1)
-    g11 = gradients[1:, 1:].repeat(d[0], 0).repeat(d[1], 1)
-
-    # Ramps
-    n00 = np.sum(np.dstack((grid[..., 0], grid[..., 1])) * g00, 2)
-    n10 = np.sum(np.dstack((grid[..., 0] - 1, grid[..., 1])) * g10, 2)
-    n01 = np.sum(np.dstack((grid[..., 0], grid[..., 1] - 1)) * g01, 2)
-    n11 = np.sum(np.dstack((grid[..., 0] - 1, grid[..., 1] - 1)) * g11, 2)
+    gradients = np.stack((np.cos(angles), np.sin(angles))).astype(dtype)
+    noise = np.empty(shape, dtype=dtype)
+    ax, ay = [_perlin_axis(n, di, dtype) for n, di in zip(shape, d)]
+    _perlin2d_kernel(noise, gradients, d, ax, ay)
+    noise *= np.sqrt(2)
+    return noise
 
-    # Interpolation
-    t = f(grid)
-    n0 = n00 * (1 - t[:, :, 0]) + t[:, :, 0] * n10
-    n1 = n01 * (1 - t[:, :, 0]) + t[:, :, 0] * n11
 
-    return np.sqrt(2) * ((1 - t[:, :, 1]) * n0 + t[:, :, 1] * n1)
+@njit(parallel=True, fastmath=True, cache=True)
+def _perlin2d_kernel(noise, gradients, d, ax, ay):
+    r"""
+    2D counterpart of ``_perlin3d_kernel``.
+    """
+    Nx, Ny = noise.shape
+    g = gradients
+    for x in prange(Nx):
+        i = x // d[0]
+        u, um, tu = ax[0, x], ax[1, x], ax[2, x]
+        for y in range(Ny):
+            j = y // d[1]
+            v, vm, tv = ay[0, y], ay[1, y], ay[2, y]
+            # Ramps
+            n00 = g[0, i, j]*u + g[1, i, j]*v
+            n10 = g[0, i+1, j]*um + g[1, i+1, j]*v
+            n01 = g[0, i, j+1]*u + g[1, i, j+1]*vm
+            n11 = g[0, i+1, j+1]*um + g[1, i+1, j+1]*vm
+            # Interpolation
+            n0 = n00 + tu * (n10 - n00)
+            n1 = n01 + tu * (n11 - n01)
+            noise[x, y] = n0 + tv * (n1 - n0)
+
+
+def _get_rng(seed):
+    r"""
+    Returns the global NumPy random state if ``seed`` is ``None``, so that
+    ``np.random.seed`` keeps working, or otherwise a ``Generator`` created
+    from ``seed``.  Both provide ``random(size)``, which is all the callers
+    use.
+    """
+    if seed is None:
+        return np.random
+    return np.random.default_rng(seed)
 
 
 def blobs(shape: List[int], porosity: float = 0.5, blobiness: int = 1,
-          **kwargs):
+          seed: int = None, **kwargs):
     """
     Generates an image containing amorphous blobs
 
@@ -887,6 +1013,11 @@ def blobs(shape: List[int], porosity: float = 0.5, blobiness: int = 1,
         a larger number of small blobs.  If a list is supplied then the blobs
         are anisotropic.
 
+    seed : int (optional)
+        Seeds a dedicated ``numpy.random.Generator`` so the result can be
+        reproduced without touching the global random state.  If ``None``
+        (default) the global state is used, so ``np.random.seed`` applies.
+
     Returns
     -------
     image : ND-array
@@ -905,7 +1036,7 @@ def blobs(shape: List[int], porosity: float = 0.5, blobiness: int = 1,
     if np.size(shape) == 1:
         shape = np.full((3, ), int(shape))
     sigma = np.mean(shape) / (40 * blobiness)
-    im = np.random.random(shape)
+    im = _get_rng(seed).random(shape)
     if parallel:
         # TODO: The determination of the overlap should be done rigorously
         im = ps.filters.chunked_func(func=spim.gaussian_filter,
@@ -913,19 +1044,49 @@ def blobs(shape: List[int], porosity: float = 0.5, blobiness: int = 1,
                                      divs=divs, cores=cores, overlap=10)
     else:
         im = spim.gaussian_filter(im, sigma=sigma)
-    im = norm_to_uniform(im, scale=[0, 1])
     if porosity:
-        im = im < porosity
+        # Thresholding after norm_to_uniform is equivalent to thresholding
+        # the filtered image at the inverse of that (monotonic) mapping,
+        # which avoids remapping the whole image
+        mu, sd, lo, hi = _blob_stats(im)
+        cmin, cmax = [erfc(-(v - mu) / (sd * np.sqrt(2))) / 2 for v in (lo, hi)]
+        c = cmin + porosity * (cmax - cmin)
+        im = im < mu - sd * np.sqrt(2) * erfcinv(2 * c)
+    else:
+        im = norm_to_uniform(im, scale=[0, 1])
     return im
 
 
+@njit(parallel=True, cache=True)
+def _blob_stats(im):
+    r"""
+    Returns the mean, standard deviation, minimum and maximum of ``im`` in
+    two parallel passes, without the full-size temporaries that computing
+    them separately with NumPy creates.
+    """
+    a = im.ravel()
+    s = 0.0
+    lo = np.inf
+    hi = -np.inf
+    for i in prange(a.size):
+        s += a[i]
+        lo = min(lo, a[i])
+        hi = max(hi, a[i])
+    mu = s / a.size
+    ss = 0.0
+    for i in prange(a.size):
+        ss += (a[i] - mu)**2
+    return mu, np.sqrt(ss / a.size), lo, hi
+
+
 def _cylinders(shape: List[int],
                radius: int,
                ncylinders: int,
                phi_max: float = 0,
                theta_max: float = 90,
                length: float = None,
-               verbose: bool = True):
+               verbose: bool = True,
+               seed: int = None):
     r"""
     Generates a binary image of overlapping cylinders.
 
@@ -959,6 +1120,10 @@ def _cylinders(shape: List[int],
         Euclidean distance between the two ends of the cylinder.  Note that
         one or both of the ends *may* still lie outside the domain, depending
         on the randomly chosen center point of the cylinder.
+    seed : int (optional)
+        Seeds a dedicated ``numpy.random.Generator`` so the result can be
+        reproduced without touching the global random state.  If ``None``
+        (default) the global state is used, so ``np.random.seed`` applies.
 
     Returns
     -------
@@ -971,7 +1136,7 @@ def _cylinders(shape: List[int],
     elif np.size(shape) == 2:
         raise Exception("2D cylinders don't make sense")
     # Find hypotenuse of domain from [0,0,0] to [Nx,Ny,Nz]
-    H = np.sqrt(np.sum(np.square(shape))).astype(int)
+    H = int(math.sqrt(int(shape[0])**2 + int(shape[1])**2 + int(shape[2])**2))
     if length is None:  # Assume cylinders span domain if length not given
         length = 2 * H
     R = min(int(length / 2), 2 * H)  # Trim given length to 2H if too long
@@ -985,26 +1150,31 @@ def _cylinders(shape: List[int],
     n = 0
     L = min(H, R)
     pbar = tqdm(total=ncylinders, file=sys.stdout, disable=not verbose)
+    rng = _get_rng(seed)
     while n < ncylinders:
-        # Choose a random starting point in domain
-        x = np.random.rand(3) * (shape + 2 * L)
-        # Chose a random phi and theta within given ranges
-        phi = (np.pi / 2 - np.pi * np.random.rand()) * phi_max / 90
-        theta = (np.pi / 2 - np.pi * np.random.rand()) * theta_max / 90
-        X0 = R * np.array([np.cos(phi) * np.cos(theta),
+        # Draw starting points and orientations for all remaining cylinders
+        # and rasterize them at once, repeating for any that missed the domain
+        m = ncylinders - n
+        # Choose random starting points in domain
+        x = rng.random((m, 3)) * (shape + 2 * L)
+        # Chose random phi and theta within given ranges
+        phi = (np.pi / 2 - np.pi * rng.random(m)) * phi_max / 90
+        theta = (np.pi / 2 - np.pi * rng.random(m)) * theta_max / 90
+        X0 = R * np.stack((np.cos(phi) * np.cos(theta),
                            np.cos(phi) * np.sin(theta),
-                           np.sin(phi)])
-        [X0, X1] = [x + X0, x - X0]
-        crds = line_segment(X0, X1)
-        lower = ~np.any(np.vstack(crds).T < [L, L, L], axis=1)
-        upper = ~np.any(np.vstack(crds).T >= shape + L, axis=1)
-        valid = upper * lower
-        if np.any(valid):
-            im[crds[0][valid] - L, crds[1][valid] - L, crds[2][valid] - L] = 1
-            n += 1
-            pbar.update()
-    im = np.array(im, dtype=bool)
-    dt = edt(~im) < radius
+                           np.sin(phi)), axis=1)
+        hits = _draw_lines(im, x + X0, x - X0, L).sum()
+        n += hits
+        pbar.update(hits)
+    # Dilate the skeletons by radius.  Stamping a ball onto each skeleton
+    # voxel gives the same result as thresholding the EDT, and is much
+    # cheaper when the skeletons are sparse or the radius is small.
+    ball = _ps_round(radius, 3)
+    if np.count_nonzero(im) * ball.size < 25 * im.size:
+        dt = np.zeros_like(im)
+        _stamp_template(dt, np.argwhere(im), ball)
+    else:
+        dt = edt(~im) < radius
     return ~dt
 
 
@@ -1015,7 +1185,8 @@ def cylinders(shape: List[int],
               phi_max: float = 0,
               theta_max: float = 90,
               length: float = None,
-              max_iter: int = 3):
+              max_iter: int = 3,
+              seed: int = None):
     r"""
     Generates a binary image of overlapping cylinders given porosity OR number
     of cylinders.
@@ -1063,6 +1234,10 @@ def cylinders(shape: List[int],
     return_fiber_number : bool
         Determines whether the function will return the number of fibers
         along with the image
+    seed : int (optional)
+        Seeds a dedicated ``numpy.random.Generator`` so the result can be
+        reproduced without touching the global random state.  If ``None``
+        (default) the global state is used, so ``np.random.seed`` applies.
 
     Returns
     -------
@@ -1097,6 +1272,7 @@ def cylinders(shape: List[int],
             phi_max=phi_max,
             theta_max=theta_max,
             length=length,
+            seed=seed,
         )
         return im
 
@@ -1129,13 +1305,16 @@ def cylinders(shape: List[int],
     for i in range(1, max_iter):
         fractions.append(fractions[i - 1] + (max_iter - i) ** 2 * subdif)
 
+    # Share one generator between the rounds so they draw different fibers
+    rng = None if seed is None else np.random.default_rng(seed)
     im = np.ones(shape, dtype=bool)
     for frac in tqdm(fractions, file=sys.stdout, desc="Adding fibers"):
         n_fibers_total = n_pixels_to_add / vol_fiber
         n_fibers = int(np.ceil(frac * n_fibers_total) - n_fibers_added)
         if n_fibers > 0:
             im = im & _cylinders(
-                shape, radius, n_fibers, phi_max, theta_max, length, verbose=False
+                shape, radius, n_fibers, phi_max, theta_max, length,
+                verbose=False, seed=rng,
             )
         n_fibers_added += n_fibers
         # Update parameters for next iteration
@@ -1181,6 +1360,71 @@ def line_segment(X0, X1):
         return [x, y]
 
 
+def _line_segments(X0, X1):
+    r"""
+    Calculates the voxel coordinates of many straight lines at once, giving
+    the same voxels as calling ``line_segment`` on each pair of end points.
+
+    Parameters
+    ----------
+    X0 and X1 : ND-array
+        N-by-2 or N-by-3 arrays of integer coordinates of the start and end
+        points of each line.
+
+    Returns
+    -------
+    coords : list of ND-arrays
+        A list of arrays containing the X, Y, and Z coordinates of the voxels
+        of all lines.
+    """
+    delta = X1 - X0
+    L = np.amax(np.absolute(delta), axis=1) + 1
+    ends = np.cumsum(L)
+    # Index of the line, and the position along it, of each returned voxel
+    line = np.repeat(np.arange(len(L)), L)
+    t = np.arange(L.sum()) - np.repeat(ends - L, L)
+    # Evaluate points as np.linspace does, so rounding matches line_segment
+    step = delta / np.maximum(L - 1, 1)[:, None]
+    crds = t[:, None] * step[line] + X0[line]
+    crds[ends - 1] = X1
+    return list(np.rint(crds).astype(int).T)
+
+
+@njit(parallel=True, cache=True)
+def _draw_lines(im, X0, X1, L):
+    r"""
+    Draws the line from ``X0[n]`` to ``X1[n]`` for each ``n`` into ``im``,
+    using the same voxels as ``line_segment`` but shifted by ``-L``, and
+    discarding those that fall outside ``im``.  Returns a boolean array
+    indicating which lines touched the image.
+    """
+    hits = np.zeros(len(X0), dtype=np.bool_)
+    for n in prange(len(X0)):
+        a = np.empty(3, dtype=np.int64)
+        b = np.empty(3, dtype=np.int64)
+        for d in range(3):
+            a[d] = int(np.rint(X0[n, d]))
+            b[d] = int(np.rint(X1[n, d]))
+        N = max(abs(b[0] - a[0]), abs(b[1] - a[1]), abs(b[2] - a[2])) + 1
+        step = (b - a) / max(N - 1, 1)
+        c = np.empty(3, dtype=np.int64)
+        for t in range(N):
+            inside = True
+            for d in range(3):
+                # Evaluate as np.linspace does so the rounding is identical
+                if t == N - 1:
+                    c[d] = b[d] - L
+                else:
+                    c[d] = int(np.rint(t * step[d] + a[d])) - L
+                if (c[d] < 0) or (c[d] >= im.shape[d]):
+                    inside = False
+                    break
+            if inside:
+                im[c[0], c[1], c[2]] = True
+                hits[n] = True
+    return hits
+
+
 def pseudo_gravity_packing(im, r, clearance=0, max_iter=1000):
     r"""
     Iteratively inserts spheres at the lowest accessible point in an image,
@@ -1220,31 +1464,66 @@ def pseudo_gravity_packing(im, r, clearance=0, max_iter=1000):
     inlets = np.zeros_like(im)
     inlets[-(r+1), ...] = True
     sites = ps.filters.trim_disconnected_blobs(im=sites, inlets=inlets)
-    x_min = np.where(sites)[0].min()
+    im = np.copy(im)
+    # The same two templates are cleared around every inserted sphere
+    sphere = _ps_round(max(int(np.around(r - clearance)), 0), im.ndim)
+    exclusion = _ps_round(2*r, im.ndim)
+    # Order all candidate sites by x, randomly among ties, so that the lowest
+    # remaining site is found by walking this list rather than searching the
+    # image after every insertion.  Sites are only ever removed, so entries
+    # that were covered by a previous sphere can simply be skipped.
+    inds = np.flatnonzero(sites)
+    x = inds // np.prod(sites.shape[1:])
+    inds = inds[np.argsort(x + np.random.rand(len(inds)))]
+    n = 0
+    x_min = x.min() if len(x) else 0
     with tqdm(range(max_iter)) as pbar:
         for _ in range(max_iter):
             pbar.update()
-            if im.ndim == 2:
-                x, y = np.where(sites[x_min:x_min+2*r, ...])
-            else:
-                x, y, z = np.where(sites[x_min:x_min+2*r, ...])
-            if len(x) == 0:
+            n = _next_site(sites.reshape(-1), inds, n)
+            if n == len(inds):
                 break
-            options = np.where(x == x.min())[0]
-            if len(options) > 1:
-                choice = np.random.randint(0, len(options)-1)
-            else:
-                choice = 0
-            if im.ndim == 2:
-                cen = np.array([x[options[choice]] + x_min,
-                                y[options[choice]]])
-            else:
-                cen = np.array([x[options[choice]] + x_min,
-                                y[options[choice]],
-                                z[options[choice]]])
-            im = ps.tools.insert_sphere(im, c=cen, r=r - clearance, v=0)
-            sites = ps.tools.insert_sphere(sites, c=cen, r=2*r, v=0)
-            x_min += x.min()
+            cen = np.array(np.unravel_index(inds[n], sites.shape))
+            if cen[0] >= x_min + 2*r:
+                break
+            _clear_template(im, cen, sphere)
+            _clear_template(sites, cen, exclusion)
+            x_min = cen[0]
     print('A total of', _, 'spheres were added')
-    im = spim.minimum_filter(input=im, footprint=strel(1))
-    return im
+    # Erode by one voxel with a cross-shaped strel(1), as a minimum_filter
+    # would, by taking the minimum with each face neighbour via slices
+    eroded = im.copy()
+    for ax in range(im.ndim):
+        lo = tuple(slice(None, -1) if i == ax else slice(None)
+                   for i in range(im.ndim))
+        hi = tuple(slice(1, None) if i == ax else slice(None)
+                   for i in range(im.ndim))
+        np.minimum(eroded[hi], im[lo], out=eroded[hi])
+        np.minimum(eroded[lo], im[hi], out=eroded[lo])
+    return eroded
+
+
+def _clear_template(im, c, template):
+    r"""
+    Sets ``im`` to zero wherever ``template`` is ``True`` when centered on
+    ``c``, cropping any part that lies outside the image.  ``template`` must
+    have odd dimensions.
+    """
+    s_im, s_tm = [], []
+    for ci, n, t in zip(c, im.shape, template.shape):
+        lo, hi = max(ci - t//2, 0), min(ci + t//2 + 1, n)
+        s_im.append(slice(lo, hi))
+        s_tm.append(slice(lo - ci + t//2, hi - ci + t//2))
+    im[tuple(s_im)][template[tuple(s_tm)]] = 0
+
+
+@njit(cache=True)
+def _next_site(sites, inds, n):
+    r"""
+    Returns the position of the first entry of ``inds``, starting from ``n``,
+    that still indexes a nonzero value of the flattened ``sites``, or
+    ``len(inds)`` if there is none.
+    """
+    while (n < len(inds)) and not sites[inds[n]]:
+        n += 1
+    return n
@@ -1,6 +1,7 @@
 import scipy as sp
 import numpy as np
 import scipy.ndimage as spim
+import os
 import warnings
 from edt import edt
 from collections import namedtuple
@@ -11,6 +12,15 @@ try:
     from skimage.measure import marching_cubes
 except ImportError:
     from skimage.measure import marching_cubes_lewiner as marching_cubes
+try:
+    import cupy
+    from cucim.core.operations.morphology import distance_transform_edt
+    # cupy can be installed without a usable device, in which case its CUDA
+    # errors (subclasses of RuntimeError) are raised here rather than later
+    _HAS_CUCIM = (os.environ.get('POROSPY_DISABLE_GPU', '0') != '1'
+                  and cupy.cuda.runtime.getDeviceCount() > 0)
+except (ImportError, RuntimeError):
+    _HAS_CUCIM = False
 
 
 def align_image_with_openpnm(im):
@@ -746,6 +756,33 @@ def norm_to_uniform(im, scale=None):
     return im
 
 
+def _edt(im):
+    r"""
+    Computes the Euclidean distance transform of ``im``, using cuCIM on the
+    GPU if it is installed and a CUDA device is available, or the ``edt``
+    package otherwise.
+
+    Parameters
+    ----------
+    im : ND-array
+        The image to transform, with the distance being found from each
+        nonzero voxel to the nearest zero voxel.
+
+    Returns
+    -------
+    dt : ND-array
+        The distance transform of ``im``, as a numpy array in both cases.
+
+    Notes
+    -----
+    Setting the environment variable ``POROSPY_DISABLE_GPU=1`` before
+    importing porespy forces the CPU version to be used.
+    """
+    if _HAS_CUCIM:
+        return cupy.asnumpy(distance_transform_edt(cupy.asarray(im)))
+    return edt(im)
+
+
 def _functions_to_table(mod, colwidth=[27, 48]):
     r"""
     Given a module of functions, returns a ReST formatted text string that
@@ -38,6 +38,20 @@ class GeneratorTest():
         porosity = im.sum() / im.size
         np.testing.assert_allclose(porosity, 0.5, rtol=1e-2)
 
+    def test_cylinders_seed(self):
+        kw = dict(shape=[50, 50, 50], radius=3, ncylinders=20)
+        im1 = ps.generators.cylinders(**kw, seed=1)
+        im2 = ps.generators.cylinders(**kw, seed=1)
+        im3 = ps.generators.cylinders(**kw, seed=2)
+        assert np.all(im1 == im2)
+        assert np.any(im1 != im3)
+        kw = dict(shape=[50, 50, 50], radius=3, porosity=0.5, max_iter=10)
+        im1 = ps.generators.cylinders(**kw, seed=1)
+        im2 = ps.generators.cylinders(**kw, seed=1)
+        im3 = ps.generators.cylinders(**kw, seed=2)
+        assert np.all(im1 == im2)
+        assert np.any(im1 != im3)
+
     def test_insert_shape_center_defaults(self):
         im = np.zeros([11, 11])
         shape = np.ones([3, 3])
@@ -65,6 +79,17 @@ class GeneratorTest():
         assert im[5, 5] == 2
         assert im[4, 5] == 1 and im[5, 4] == 1
 
+    def test_insert_shape_no_copy(self):
+        im = np.zeros([11, 11])
+        shape = np.ones([3, 3])
+        im2 = ps.generators.insert_shape(im, element=shape, center=[5, 5])
+        assert np.sum(im) == 0
+        assert np.sum(im2) == np.prod(shape.shape)
+        im2 = ps.generators.insert_shape(im, element=shape, center=[5, 5],
+                                         copy=False)
+        assert im2 is im
+        assert np.sum(im) == np.prod(shape.shape)
+
     def test_insert_shape_center_outside_im(self):
         im = np.zeros([11, 11])
         shape = np.ones([3, 3])
@@ -146,6 +171,15 @@ class GeneratorTest():
             phi_actual = im.sum() / np.size(im)
             assert abs(phi_actual - phi) < 0.02
 
+    def test_overlapping_spheres_tol(self):
+        for seed in range(5):
+            np.random.seed(seed)
+            im = ps.generators.overlapping_spheres(shape=[200, 200], radius=8,
+                                                    porosity=0.2, tol=0.01)
+            phi_actual = im.sum() / np.size(im)
+            assert abs(phi_actual - 0.2) <= 0.01
+        np.random.seed()
+
     def test_overlapping_spheres_3d(self):
         phis = np.arange(0.1, 0.9, 0.2)
         for phi in phis:
@@ -220,6 +254,13 @@ class GeneratorTest():
         im = ps.generators.blobs(shape=[101])
         assert len(list(im.shape)) == 3
 
+    def test_blobs_seed(self):
+        im1 = ps.generators.blobs(shape=[50, 50], seed=1)
+        im2 = ps.generators.blobs(shape=[50, 50], seed=1)
+        im3 = ps.generators.blobs(shape=[50, 50], seed=2)
+        assert np.all(im1 == im2)
+        assert np.any(im1 != im3)
+
     def test_RSA_2d_contained(self):
         im = np.zeros([100, 100], dtype=int)
         im = ps.generators.RSA(im, radius=10, volume_fraction=0.5,
@@ -287,6 +287,13 @@ class ToolsTest():
         c = ps.tools.ps_rect(w=3, ndim=3)
         assert c.sum() == 27
 
+    def test_edt(self):
+        im = ps.generators.blobs(shape=[50, 50, 50])
+        dt = ps.tools._edt(im)
+        assert isinstance(dt, np.ndarray)
+        np.testing.assert_allclose(dt, spim.distance_transform_edt(im),
+                                   rtol=1e-5)
+
 
 if __name__ == '__main__':
     t = ToolsTest()